@@ -1,164 +1,606 @@
-import requests
-import json
-import time
+"""Three-model dialogue: two models converse while a third comments, all
+served from a single OpenAI-compatible endpoint such as LM Studio.
+
+Requires aiohttp>=3.10: 3.9.x showed severe per-request stalls on
+back-to-back chat-completions calls, and the pooled keep-alive session
+used here relies on the fixed connection handling.
+"""
+import sys
+import heapq
+import random
 import asyncio
+import itertools
 import aiohttp
-from typing import List, Dict, Optional
+import orjson
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, List, Dict, Optional
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4
+
+class PriorityLimiter:
+    """Concurrency cap that admits the waiter with the lowest priority value first"""
+    def __init__(self, limit: int):
+        self._free = limit
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        
+    async def acquire(self, priority: int):
+        """Wait for a free slot"""
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if not fut.cancelled():
+                self.release()
+            raise
+        
+    def release(self):
+        """Hand the slot to the best waiter, or return it to the pool"""
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._free += 1
+        
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+class LLMError(Exception):
+    """A chat-completions request failed permanently"""
+    def __init__(self, status: Optional[int], detail: str = ""):
+        self.status = status
+        self.detail = detail
+        reason = f"HTTP {status}" if status is not None else "request failed"
+        super().__init__(f"{reason}: {detail}" if detail else reason)
 
 class ModelClient:
-    def __init__(self, name: str, model_name: str, system_prompt: str = ""):
+    MAX_HISTORY_MESSAGES = 20
+    
+    def __init__(self, name: str, model_name: str, system_prompt: str = "",
+                 keep_history: bool = True, history_token_budget: int = 2048):
         self.name = name
         self.model_name = model_name
         self.system_prompt = system_prompt
-        self.conversation_history = []
+        # The system prompt never changes, so its JSON is encoded once
+        self._system_msg_encoded: Optional[bytes] = (
+            orjson.dumps({"role": "system", "content": system_prompt}) if system_prompt else None
+        )
+        # Clients whose prompts already carry their full context (e.g. the
+        # commentator) skip history so prompt length stays constant
+        self.keep_history = keep_history
+        # Keep history manageable: at most the last 10 exchanges, and no more
+        # than history_token_budget estimated tokens so one long reply cannot
+        # crowd out the context window
+        self.history_token_budget = history_token_budget
+        self.conversation_history = deque()
+        # Live list of pre-encoded request messages: the pinned system message
+        # (if any) followed by the history, kept in step with conversation_history
+        self._encoded_messages: List[bytes] = (
+            [self._system_msg_encoded] if self._system_msg_encoded is not None else []
+        )
+        self._history_start = len(self._encoded_messages)
+        self._history_tokens = 0
         
-    async def generate_response(self, session: aiohttp.ClientSession, prompt: str, 
-                              base_url: str, temperature: float = 0.7, max_tokens: int = 500) -> str:
-        """Generate a response from the model"""
-        messages = []
+    def history_tokens(self) -> int:
+        """Estimated prompt tokens contributed by the stored history"""
+        return self._history_tokens
         
-        # Add system prompt if provided
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-            
-        # Add conversation history
-        messages.extend(self.conversation_history)
+    def fork(self) -> "ModelClient":
+        """Return a client with the same configuration and an empty history"""
+        return ModelClient(self.name, self.model_name, self.system_prompt, self.keep_history,
+                           self.history_token_budget)
         
-        # Add current prompt
-        messages.append({"role": "user", "content": prompt})
+    def _remember(self, role: str, content: str, encoded: Optional[bytes] = None):
+        """Append a message to the history and its encoded copy"""
+        message = {"role": role, "content": content}
+        self.conversation_history.append(message)
+        self._encoded_messages.append(encoded if encoded is not None else orjson.dumps(message))
+        self._history_tokens += _estimate_tokens(content)
         
-        payload = {
-            "model": self.model_name,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-            "stream": False
-        }
+    def _trim_history(self):
+        """Drop the oldest (user, assistant) pairs until within the message and token limits"""
+        while self.conversation_history and (
+                len(self.conversation_history) > self.MAX_HISTORY_MESSAGES
+                or self._history_tokens > self.history_token_budget):
+            for _ in range(2):
+                message = self.conversation_history.popleft()
+                self._history_tokens -= _estimate_tokens(message["content"])
+            del self._encoded_messages[self._history_start:self._history_start + 2]
         
+    async def generate_response(self, session: aiohttp.ClientSession, prompt: str, 
+                              base_url: str, temperature: float = 0.7, max_tokens: int = 500,
+                              max_attempts: int = 5) -> str:
+        """Generate a complete response from the model"""
+        chunks = []
+        async for chunk in self.stream_response(session, prompt, base_url, temperature,
+                                                max_tokens, max_attempts):
+            chunks.append(chunk)
+        return "".join(chunks)
+        
+    async def stream_response(self, session: aiohttp.ClientSession, prompt: str, 
+                              base_url: str, temperature: float = 0.7, max_tokens: int = 500,
+                              max_attempts: int = 5) -> AsyncGenerator[str, None]:
+        """Stream a response from the model as it is generated"""
+        # Assemble the request body from already-encoded message fragments
+        # so only the new user message has to be serialized on each call.
+        # The prompt is pushed onto the live list just long enough to join it.
+        encoded_prompt = orjson.dumps({"role": "user", "content": prompt})
+        self._encoded_messages.append(encoded_prompt)
         try:
-            async with session.post(f"{base_url}/v1/chat/completions", 
-                                  json=payload, 
-                                  headers={"Content-Type": "application/json"}) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    assistant_response = result["choices"][0]["message"]["content"]
-                    
-                    # Update conversation history
-                    self.conversation_history.append({"role": "user", "content": prompt})
-                    self.conversation_history.append({"role": "assistant", "content": assistant_response})
-                    
-                    # Keep history manageable (last 10 exchanges)
-                    if len(self.conversation_history) > 20:
-                        self.conversation_history = self.conversation_history[-20:]
+            body = self._build_body(self._encoded_messages, temperature, max_tokens)
+        finally:
+            self._encoded_messages.pop()
+        
+        chunks = []
+        async for chunk in self._post_stream(session, base_url, body, max_attempts):
+            chunks.append(chunk)
+            yield chunk
+        
+        # Update conversation history
+        if self.keep_history:
+            self._remember("user", prompt, encoded_prompt)
+            self._remember("assistant", "".join(chunks))
+            self._trim_history()
+        
+    async def generate_response_with_messages(self, session: aiohttp.ClientSession,
+                                              extra_messages: List[Dict], base_url: str,
+                                              temperature: float = 0.7, max_tokens: int = 500,
+                                              max_attempts: int = 5) -> str:
+        """Generate a response to an explicit message list, bypassing conversation history
+        
+        Only the system prompt is prepended; nothing is recorded in the history.
+        """
+        encoded = [orjson.dumps(message) for message in extra_messages]
+        if self._system_msg_encoded is not None:
+            encoded.insert(0, self._system_msg_encoded)
+        body = self._build_body(encoded, temperature, max_tokens)
+        
+        chunks = []
+        async for chunk in self._post_stream(session, base_url, body, max_attempts):
+            chunks.append(chunk)
+        return "".join(chunks)
+        
+    def _build_body(self, encoded_messages: List[bytes], temperature: float,
+                    max_tokens: int) -> bytes:
+        """Splice a streaming chat-completions request body from encoded messages"""
+        return b"".join((
+            b'{"model":', orjson.dumps(self.model_name),
+            b',"messages":[', b",".join(encoded_messages),
+            b'],"temperature":', orjson.dumps(temperature),
+            b',"max_tokens":', orjson.dumps(max_tokens),
+            b',"stream":true}'
+        ))
+        
+    async def _post_stream(self, session: aiohttp.ClientSession, base_url: str, body: bytes,
+                           max_attempts: int) -> AsyncGenerator[str, None]:
+        """POST a request body and yield content deltas
+        
+        Transient failures (HTTP 429/5xx, timeouts, connection errors) are
+        retried with exponential backoff as long as nothing has been yielded
+        yet; anything else, or running out of attempts, raises LLMError.
+        """
+        for attempt in range(max_attempts):
+            started = False
+            try:
+                async with session.post(f"{base_url}/v1/chat/completions", 
+                                      data=body, 
+                                      headers={"Content-Type": "application/json"}) as response:
+                    if response.status != 200:
+                        raise LLMError(response.status, await response.text())
                     
-                    return assistant_response
-                else:
-                    return f"Error: HTTP {response.status}"
-        except Exception as e:
-            return f"Error: {str(e)}"
+                    # Server-sent events: one "data: {...}" line per delta
+                    async for line in response.content:
+                        line = line.strip()
+                        if not line.startswith(b"data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == b"[DONE]":
+                            break
+                        delta = self._parse_delta(data)
+                        if delta:
+                            started = True
+                            yield delta
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError, LLMError) as e:
+                transient = (not isinstance(e, LLMError)
+                             or (e.status is not None and (e.status == 429 or e.status >= 500)))
+                # A half-streamed reply cannot be retried without duplicating output
+                if started or not transient or attempt == max_attempts - 1:
+                    if isinstance(e, LLMError):
+                        raise
+                    raise LLMError(None, str(e) or type(e).__name__) from e
+            
+            await asyncio.sleep(min((1 << attempt) + random.random(), 30))
+
+    @staticmethod
+    def _parse_delta(data: bytes) -> Optional[str]:
+        """Extract the content delta from one SSE event, raising LLMError if it is malformed"""
+        try:
+            event = orjson.loads(data)
+            if "error" in event:
+                raise LLMError(None, f"server error event: {event['error']}")
+            # Usage-only events carry no choices; role/finish events no content
+            choices = event.get("choices") or []
+            if not choices:
+                return None
+            return (choices[0].get("delta") or {}).get("content")
+        except (orjson.JSONDecodeError, AttributeError, TypeError, KeyError, IndexError) as e:
+            raise LLMError(None, f"malformed stream event: {e!r}") from e
+
+def _write_stdout(text: str):
+    """Blocking stdout write, run off the event loop"""
+    sys.stdout.write(text)
+    sys.stdout.flush()
 
 class DialogueOrchestrator:
-    def __init__(self, base_url: str):
+    MODES = ("chained", "parallel")
+    
+    def __init__(self, base_url: str, max_concurrent: int = 4, mode: str = "chained"):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {self.MODES}, got {mode!r}")
         self.base_url = base_url.rstrip('/')
+        # "chained": B answers A within a round; "parallel": A and B answer
+        # each other's previous reply concurrently
+        self.mode = mode
         self.models = {}
         self.dialogue_history = []
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Caps in-flight requests to the server; when requests queue up,
+        # clients with the shortest history (least prefill work) go first
+        self.max_concurrent = max_concurrent
+        self._limiter = PriorityLimiter(max_concurrent)
+        # Output is queued and written by a background task so stdout never blocks the loop
+        self._out_q: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        
+    async def __aenter__(self):
+        """Open a single pooled HTTP session shared by every model call"""
+        connector = aiohttp.TCPConnector(limit=64, limit_per_host=32, force_close=False,
+                                         keepalive_timeout=75, enable_cleanup_closed=True)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=120)
+        )
+        self._out_q = asyncio.Queue()
+        self._writer = asyncio.create_task(self._drain_stdout())
+        await self._prewarm(self.max_concurrent)
+        return self
+        
+    async def _prewarm(self, connections: int):
+        """Open keep-alive connections up front so round 1 skips the handshake"""
+        async def ping():
+            async with self.session.get(f"{self.base_url}/v1/models",
+                                        timeout=aiohttp.ClientTimeout(total=2)) as response:
+                await response.read()
+        
+        # A down or slow server should not block startup; real calls report errors
+        await asyncio.gather(*(ping() for _ in range(connections)), return_exceptions=True)
+        
+    async def __aexit__(self, exc_type, exc, tb):
+        """Flush pending output and close the shared HTTP session"""
+        try:
+            if self._writer is not None:
+                self._out_q.put_nowait(None)
+                await self._writer
+        finally:
+            # Close the session even if the writer failed (e.g. a broken stdout pipe)
+            self._writer = None
+            self._out_q = None
+            if self.session is not None:
+                await self.session.close()
+                self.session = None
         
     def add_model(self, role: str, client: ModelClient):
         """Add a model to the orchestrator"""
         self.models[role] = client
         
+    def _spawn(self) -> "DialogueOrchestrator":
+        """Create a worker for one concurrent dialogue
+        
+        The worker shares this orchestrator's session and concurrency cap but
+        gets forked clients and its own unwritten output queue.
+        """
+        worker = DialogueOrchestrator(self.base_url, self.max_concurrent, self.mode)
+        worker.session = self.session
+        worker._limiter = self._limiter
+        worker._out_q = asyncio.Queue()
+        for role, client in self.models.items():
+            worker.add_model(role, client.fork())
+        return worker
+        
+    async def _generate(self, role: str, prompt: str,
+                        sink: Optional[asyncio.Queue] = None) -> str:
+        """Ask the model in the given role for a response, within the concurrency cap
+        
+        When a sink is given the response is streamed into it chunk by chunk,
+        followed by a None sentinel.
+        """
+        client = self.models[role]
+        priority = client.history_tokens() + _estimate_tokens(prompt)
+        async with self._limiter.slot(priority):
+            if sink is None:
+                return await client.generate_response(self.session, prompt, self.base_url)
+            chunks = []
+            try:
+                async for chunk in client.stream_response(self.session, prompt, self.base_url):
+                    chunks.append(chunk)
+                    sink.put_nowait(chunk)
+            finally:
+                sink.put_nowait(None)
+            return "".join(chunks)
+        
+    async def _echo(self, sink: asyncio.Queue):
+        """Forward streamed chunks to the output until the response is complete"""
+        while (chunk := await sink.get()) is not None:
+            self._out_q.put_nowait(chunk)
+        
+    async def _comment(self, messages: List[Dict]) -> str:
+        """Ask the commentator about an explicit message list, within the concurrency cap"""
+        priority = sum(_estimate_tokens(message["content"]) for message in messages)
+        async with self._limiter.slot(priority):
+            return await self.models['commentator'].generate_response_with_messages(
+                self.session, messages, self.base_url
+            )
+        
+    def _print(self, text: str = ""):
+        """Queue a line of output for the background writer"""
+        self._out_q.put_nowait(text + "\n")
+        
+    async def _drain_stdout(self):
+        """Write queued output in batches from a worker thread until the None sentinel arrives"""
+        while True:
+            chunks = [await self._out_q.get()]
+            while not self._out_q.empty():
+                chunks.append(self._out_q.get_nowait())
+            text = "".join(chunk for chunk in chunks if chunk is not None)
+            if text:
+                await asyncio.to_thread(_write_stdout, text)
+            if chunks[-1] is None:
+                return
+        
+    @staticmethod
+    async def _cancel_tasks(*tasks: Optional[asyncio.Task]):
+        """Cancel outstanding tasks and wait for them, discarding results and errors"""
+        tasks = [task for task in tasks if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+    def _transcript(self, turns: List[Dict]) -> str:
+        """Format dialogue turns for the commentator, keeping the most recent ones
+        that fit within the commentator's history_token_budget
+        """
+        budget = self.models['commentator'].history_token_budget
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            line = f"[Round {turn['round']}] {self.models[turn['speaker']].name}: {turn['content']}"
+            cost = _estimate_tokens(line)
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        kept.reverse()
+        if len(kept) < len(turns):
+            kept.insert(0, f"[{len(turns) - len(kept)} earlier turns omitted for length]")
+        return "\n\n".join(kept)
+        
+    async def _print_commentary(self, task: asyncio.Task):
+        """Wait for a background commentary and print it"""
+        try:
+            commentary = await task
+        except LLMError as e:
+            commentary = f"(commentary unavailable: {e})"
+        self._print(f"💬 {self.models['commentator'].name} Commentary:")
+        self._print(f"📝 {commentary}\n")
+        self._print("=" * 60)
+        
     async def run_dialogue(self, initial_topic: str, rounds: int = 5, 
                           commentary_frequency: int = 2):
-        """Run the dialogue between models with commentary"""
-        print(f"🎭 Starting dialogue on topic: {initial_topic}\n")
-        print("=" * 60)
+        """Run the dialogue between models with commentary
         
-        async with aiohttp.ClientSession() as session:
-            # Initialize the conversation
-            current_prompt = initial_topic
-            
+        If a model call fails permanently the remaining rounds and the final
+        commentary are skipped rather than feeding the error into the dialogue.
+        """
+        if self.session is None:
+            raise RuntimeError("DialogueOrchestrator must be used as 'async with DialogueOrchestrator(...)'")
+        
+        self._print(f"🎭 Starting dialogue on topic: {initial_topic}\n")
+        self._print("=" * 60)
+        
+        # Initialize the conversation; this run's turns start here in dialogue_history
+        history_start = len(self.dialogue_history)
+        current_prompt = initial_topic
+        prompt_b = initial_topic
+        # Commentary runs in the background while the next round starts
+        pending_commentary: Optional[asyncio.Task] = None
+        aborted = False
+        
+        task_a = task_b = None
+        try:
             for round_num in range(rounds):
-                print(f"\n🔄 Round {round_num + 1}")
-                print("-" * 40)
+                # Model A responds (started before the previous commentary is awaited;
+                # its streamed output is buffered in the sink until it is echoed)
+                sink_a, sink_b = asyncio.Queue(), asyncio.Queue()
+                task_a = asyncio.create_task(self._generate('model_a', current_prompt, sink_a))
+                task_b = None
+                if self.mode == "parallel":
+                    task_b = asyncio.create_task(self._generate('model_b', prompt_b, sink_b))
                 
-                # Model A responds
-                print(f"🤖 {self.models['model_a'].name}:")
-                response_a = await self.models['model_a'].generate_response(
-                    session, current_prompt, self.base_url
-                )
-                print(f"{response_a}\n")
-                self.dialogue_history.append({
-                    "round": round_num + 1,
-                    "speaker": "model_a",
-                    "content": response_a
-                })
+                if pending_commentary is not None:
+                    await self._print_commentary(pending_commentary)
+                    pending_commentary = None
                 
-                # Model B responds to A's response
-                print(f"🤖 {self.models['model_b'].name}:")
-                response_b = await self.models['model_b'].generate_response(
-                    session, response_a, self.base_url
-                )
-                print(f"{response_b}\n")
-                self.dialogue_history.append({
-                    "round": round_num + 1,
-                    "speaker": "model_b", 
-                    "content": response_b
-                })
+                self._print(f"\n🔄 Round {round_num + 1}")
+                self._print("-" * 40)
+                
+                try:
+                    self._print(f"🤖 {self.models['model_a'].name}:")
+                    await self._echo(sink_a)
+                    response_a = await task_a
+                    self._print("\n")
+                    self.dialogue_history.append({
+                        "round": round_num + 1,
+                        "speaker": "model_a",
+                        "content": response_a
+                    })
+                    
+                    # Model B responds to A's response, or to A's previous one when parallel
+                    self._print(f"🤖 {self.models['model_b'].name}:")
+                    if task_b is None:
+                        task_b = asyncio.create_task(self._generate('model_b', response_a, sink_b))
+                    await self._echo(sink_b)
+                    response_b = await task_b
+                    self._print("\n")
+                    self.dialogue_history.append({
+                        "round": round_num + 1,
+                        "speaker": "model_b", 
+                        "content": response_b
+                    })
+                except LLMError as e:
+                    await self._cancel_tasks(task_a, task_b, pending_commentary)
+                    pending_commentary = None
+                    self._print(f"\n⚠️ Dialogue stopped in round {round_num + 1}: {e}")
+                    aborted = True
+                    break
                 
                 # Commentary model provides analysis
                 if (round_num + 1) % commentary_frequency == 0:
-                    print(f"💬 {self.models['commentator'].name} Commentary:")
-                    
-                    # Prepare context for commentator
-                    recent_exchange = f"""
-                    Recent exchange:
-                    {self.models['model_a'].name}: {response_a}
-                    
-                    {self.models['model_b'].name}: {response_b}
-                    
-                    Please provide commentary on this exchange, analyzing the dialogue quality, 
-                    key points, areas of agreement/disagreement, and interesting developments.
-                    """
-                    
-                    commentary = await self.models['commentator'].generate_response(
-                        session, recent_exchange, self.base_url
+                    name_a, name_b = self.models['model_a'].name, self.models['model_b'].name
+                    instruction = (
+                        "Please provide commentary on this exchange, analyzing the dialogue quality, "
+                        "key points, areas of agreement/disagreement, and interesting developments."
                     )
-                    print(f"📝 {commentary}\n")
-                    print("=" * 60)
+                    if self.mode == "chained":
+                        # Prepare context for commentator as a structured exchange
+                        # rather than one concatenated blob: B really replied to A
+                        recent_exchange = [
+                            {"role": "user", "content": response_a},
+                            {"role": "assistant", "content": response_b},
+                            {"role": "user", "content": (
+                                "The two messages above are a recent exchange: the first is from "
+                                f"{name_a}, the reply is from {name_b}. {instruction}"
+                            )},
+                        ]
+                    else:
+                        # In parallel mode neither reply answers the other, so both are
+                        # presented side by side as independent turns
+                        answered = ("the opening topic" if round_num == 0
+                                    else "the other's message from the previous round")
+                        recent_exchange = [
+                            {"role": "user", "content": (
+                                f"In this round {name_a} and {name_b} replied at the same time, each "
+                                f"to {answered}, not to each other.\n\n"
+                                f"{name_a}: {response_a}\n\n"
+                                f"{name_b}: {response_b}\n\n"
+                                f"{instruction}"
+                            )},
+                        ]
+                    
+                    pending_commentary = asyncio.create_task(self._comment(recent_exchange))
                 
                 # Set up next round's prompt
                 current_prompt = response_b
-                
-                # Add a small delay to avoid overwhelming the APIs
-                await asyncio.sleep(1)
+                prompt_b = response_a
+        except BaseException:
+            # Never leave model calls running against a session about to close
+            await self._cancel_tasks(task_a, task_b, pending_commentary)
+            raise
+        
+        if pending_commentary is not None:
+            await self._print_commentary(pending_commentary)
+        
+        if aborted:
+            return
         
         # Final comprehensive commentary
-        print(f"\n🎯 Final Commentary from {self.models['commentator'].name}:")
-        print("=" * 60)
-        
-        final_summary = f"""
-        Please provide a comprehensive analysis of the entire dialogue between 
-        {self.models['model_a'].name} and {self.models['model_b'].name} on the topic: {initial_topic}
-        
-        Key aspects to analyze:
-        - Overall dialogue quality and coherence
-        - Main themes and arguments presented
-        - Evolution of the discussion
-        - Notable insights or interesting points
-        - Areas where the models complemented or challenged each other
-        """
+        self._print(f"\n🎯 Final Commentary from {self.models['commentator'].name}:")
+        self._print("=" * 60)
         
-        async with aiohttp.ClientSession() as session:
-            final_commentary = await self.models['commentator'].generate_response(
-                session, final_summary, self.base_url
+        # The commentator keeps no history, so the transcript goes in the prompt
+        transcript = self._transcript(self.dialogue_history[history_start:])
+        name_a, name_b = self.models['model_a'].name, self.models['model_b'].name
+        if self.mode == "chained":
+            turn_order = f"Each round, {name_b} replied to {name_a}, and {name_a} then replied to {name_b}."
+        else:
+            turn_order = (
+                f"Each round, {name_a} and {name_b} replied at the same time, each to the other's "
+                "message from the previous round (both to the topic in round 1), not to each other."
             )
-            print(final_commentary)
+        final_summary = (
+            "Please provide a comprehensive analysis of the entire dialogue between "
+            f"{name_a} and {name_b} on the topic: {initial_topic}\n"
+            f"{turn_order}\n\n"
+            f"Transcript:\n{transcript}\n\n"
+            "Key aspects to analyze:\n"
+            "- Overall dialogue quality and coherence\n"
+            "- Main themes and arguments presented\n"
+            "- Evolution of the discussion\n"
+            "- Notable insights or interesting points\n"
+            "- Areas where the models complemented or challenged each other"
+        )
+        
+        sink = asyncio.Queue()
+        final_task = asyncio.create_task(self._generate('commentator', final_summary, sink))
+        try:
+            await self._echo(sink)
+        except BaseException:
+            await self._cancel_tasks(final_task)
+            raise
+        try:
+            await final_task
+        except LLMError as e:
+            self._print(f"⚠️ Final commentary unavailable: {e}")
+        self._print()
+        
+    async def run_dialogues(self, topics: List[str], rounds: int = 5,
+                            commentary_frequency: int = 2) -> List[List[Dict]]:
+        """Run one dialogue per topic concurrently and return each dialogue's history
+        
+        Every dialogue's output is printed as a single block once it finishes,
+        so concurrent transcripts do not interleave. If any dialogue raises,
+        the others are cancelled and the errors surface as an ExceptionGroup.
+        """
+        if self.session is None:
+            raise RuntimeError("DialogueOrchestrator must be used as 'async with DialogueOrchestrator(...)'")
+        
+        async def run_one(topic: str) -> List[Dict]:
+            worker = self._spawn()
+            try:
+                await worker.run_dialogue(topic, rounds, commentary_frequency)
+            finally:
+                # Keep whatever was produced, even for a failed or cancelled dialogue
+                output = []
+                while not worker._out_q.empty():
+                    output.append(worker._out_q.get_nowait())
+                self._out_q.put_nowait("".join(output) + "\n")
+            return worker.dialogue_history
+        
+        # A TaskGroup cancels sibling dialogues on failure, so none keeps
+        # running against the shared session after it closes
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(run_one(topic)) for topic in topics]
+        return [task.result() for task in tasks]
 
 # Example usage and configuration
 async def main():
     # Configure your single LM Studio endpoint
     base_url = "http://10.226.10.31:1234"  # Your LM Studio server
-    orchestrator = DialogueOrchestrator(base_url)
     
     # Model A - Creative/Philosophical
     model_a = ModelClient(
@@ -184,24 +626,34 @@ async def main():
         model_name="deepseek-r1-distill-qwen-7b",  # Your third model (example name)
         system_prompt="""You are an insightful observer who analyzes conversations. 
         Provide thoughtful commentary on dialogue quality, key insights, and interesting dynamics. 
-        Be constructive and highlight both strengths and areas for improvement."""
+        Be constructive and highlight both strengths and areas for improvement.""",
+        keep_history=False  # Each commentary prompt already contains the exchange
     )
     
-    # Add models to orchestrator
-    orchestrator.add_model("model_a", model_a)
-    orchestrator.add_model("model_b", model_b)
-    orchestrator.add_model("commentator", commentator)
-    
-    # Start the dialogue
-    topic = "What role should artificial intelligence play in creative endeavors?"
-    await orchestrator.run_dialogue(topic, rounds=6, commentary_frequency=2)
+    # One pooled HTTP session is shared for the whole run
+    async with DialogueOrchestrator(base_url) as orchestrator:
+        # Add models to orchestrator
+        orchestrator.add_model("model_a", model_a)
+        orchestrator.add_model("model_b", model_b)
+        orchestrator.add_model("commentator", commentator)
+        
+        # Start the dialogue
+        topic = "What role should artificial intelligence play in creative endeavors?"
+        await orchestrator.run_dialogue(topic, rounds=6, commentary_frequency=2)
 
 if __name__ == "__main__":
     # Install required packages first:
-    # pip install aiohttp requests
+    # pip install 'aiohttp>=3.10' orjson
+    # Optional, Linux/macOS only, for a faster event loop:
+    # pip install uvloop
     
     print("Three-Model Dialogue System")
     print("Make sure you have multiple models loaded in LM Studio!")
     print("Update the model names in the main() function before running.\n")
     
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
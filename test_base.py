@@ -0,0 +1,346 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import orjson
+import pytest
+from aiohttp import web
+
+import base
+
+
+def sse(*events) -> bytes:
+    """Encode chat-completions stream events as a server-sent-events body"""
+    lines = [b"data: " + (event if isinstance(event, bytes) else orjson.dumps(event)) + b"\n\n"
+             for event in events]
+    return b"".join(lines) + b"data: [DONE]\n\n"
+
+
+def delta(content: str) -> dict:
+    return {"choices": [{"delta": {"content": content}}]}
+
+
+@asynccontextmanager
+async def stub_server(handler):
+    """Serve handler as /v1/chat/completions on a free local port and yield its base URL"""
+    async def models(request):
+        return web.json_response({"data": []})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handler)
+    app.router.add_get("/v1/models", models)
+    runner = web.AppRunner(app, shutdown_timeout=0.1)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    """Make retry backoff instant"""
+    real_sleep = asyncio.sleep
+
+    async def fast_sleep(delay, *args):
+        await real_sleep(0)
+
+    monkeypatch.setattr(base.asyncio, "sleep", fast_sleep)
+
+
+def test_run_dialogues_cancels_siblings_and_keeps_output(monkeypatch, capsys):
+    real_stream = base.ModelClient.stream_response
+
+    async def stream_response(self, session, prompt, *args, **kwargs):
+        if prompt == "fail":
+            raise RuntimeError("boom")
+        async for chunk in real_stream(self, session, prompt, *args, **kwargs):
+            yield chunk
+
+    monkeypatch.setattr(base.ModelClient, "stream_response", stream_response)
+
+    async def hang(request):
+        await asyncio.Event().wait()
+
+    async def main():
+        async with stub_server(hang) as url:
+            async with base.DialogueOrchestrator(url) as orchestrator:
+                for role in ("model_a", "model_b", "commentator"):
+                    orchestrator.add_model(role, base.ModelClient(role, role))
+                with pytest.raises(ExceptionGroup):
+                    await orchestrator.run_dialogues(["ok", "fail"], rounds=2)
+                # Nothing from base.py may still be talking to the session
+                leftover = [task for task in asyncio.all_tasks()
+                            if task.get_coro().cr_code.co_filename == base.__file__
+                            and task is not orchestrator._writer]
+                assert leftover == []
+
+    asyncio.run(main())
+    out = capsys.readouterr().out
+    assert "Starting dialogue on topic: ok" in out
+    assert "Starting dialogue on topic: fail" in out
+
+
+def test_cancelling_during_final_commentary_reaps_its_task():
+    final_started = asyncio.Event()
+
+    async def handler(request):
+        body = await request.json()
+        response = web.StreamResponse()
+        await response.prepare(request)
+        if body["model"] == "commentator":
+            await response.write(b"data: " + orjson.dumps(delta("thinking")) + b"\n\n")
+            final_started.set()
+            await asyncio.Event().wait()
+        await response.write(sse(delta("reply")))
+        return response
+
+    async def main():
+        async with stub_server(handler) as url:
+            async with base.DialogueOrchestrator(url) as orchestrator:
+                for role in ("model_a", "model_b", "commentator"):
+                    orchestrator.add_model(role, base.ModelClient(role, role))
+                run = asyncio.create_task(
+                    orchestrator.run_dialogue("topic", rounds=1, commentary_frequency=99)
+                )
+                await final_started.wait()
+                run.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await run
+                leftover = [task for task in asyncio.all_tasks()
+                            if task.get_coro().cr_code.co_filename == base.__file__
+                            and task is not orchestrator._writer]
+                assert leftover == []
+
+    asyncio.run(main())
+
+
+def test_session_closed_when_output_writer_fails(monkeypatch):
+    def broken_pipe(text):
+        raise BrokenPipeError
+
+    monkeypatch.setattr(base, "_write_stdout", broken_pipe)
+
+    async def unused(request):
+        return web.Response(status=404)
+
+    async def main():
+        async with stub_server(unused) as url:
+            orchestrator = base.DialogueOrchestrator(url)
+            with pytest.raises(BrokenPipeError):
+                async with orchestrator:
+                    session = orchestrator.session
+                    orchestrator._print("hello")
+            assert session.closed
+            assert orchestrator.session is None
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("mode", ["chained", "parallel"])
+def test_final_commentary_transcript_is_capped_and_states_mode(mode):
+    prompts = []
+
+    async def handler(request):
+        body = await request.json()
+        prompts.append((body["model"], body["messages"][-1]["content"]))
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(sse(delta(f"{body['model']} says " + "x" * 200)))
+        return response
+
+    async def main():
+        async with stub_server(handler) as url:
+            async with base.DialogueOrchestrator(url, mode=mode) as orchestrator:
+                orchestrator.add_model("model_a", base.ModelClient("A", "model_a"))
+                orchestrator.add_model("model_b", base.ModelClient("B", "model_b"))
+                orchestrator.add_model("commentator", base.ModelClient(
+                    "C", "commentator", keep_history=False, history_token_budget=120
+                ))
+                await orchestrator.run_dialogue("topic", rounds=3, commentary_frequency=99)
+
+    asyncio.run(main())
+    final = prompts[-1][1]
+    assert "[Round 3] B:" in final
+    assert "[Round 1] A:" not in final
+    assert "earlier turns omitted" in final
+    transcript = final.split("Transcript:\n")[1].split("\n\nKey aspects")[0]
+    assert base._estimate_tokens(transcript) <= 120 + 20
+    if mode == "parallel":
+        assert "replied at the same time" in final
+    else:
+        assert "B replied to A" in final
+
+
+def test_priority_limiter_admits_lowest_priority_first():
+    async def main():
+        limiter = base.PriorityLimiter(1)
+        order = []
+
+        async def worker(priority):
+            async with limiter.slot(priority):
+                order.append(priority)
+                await asyncio.sleep(0)
+
+        await limiter.acquire(0)
+        tasks = [asyncio.create_task(worker(priority)) for priority in (5, 1, 3)]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == [1, 3, 5]
+        assert limiter._free == 1
+
+    asyncio.run(main())
+
+
+def test_priority_limiter_skips_cancelled_waiter():
+    async def main():
+        limiter = base.PriorityLimiter(1)
+        await limiter.acquire(0)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        assert limiter._free == 1
+
+    asyncio.run(main())
+
+
+def test_priority_limiter_returns_slot_handed_to_cancelled_waiter():
+    async def main():
+        limiter = base.PriorityLimiter(1)
+        await limiter.acquire(0)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        # Hand the slot over, then cancel before the waiter gets to run
+        limiter.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter._free == 1
+        await asyncio.wait_for(limiter.acquire(2), timeout=1)
+
+    asyncio.run(main())
+
+
+def scripted(*steps):
+    """Handler that plays one step per request: an HTTP status to fail with,
+    raw SSE bytes to stream, or "drop" to cut the connection after headers
+    """
+    calls = []
+
+    async def handler(request):
+        step = steps[min(len(calls), len(steps) - 1)]
+        calls.append(step)
+        if isinstance(step, int):
+            return web.Response(status=step, text="nope")
+        response = web.StreamResponse()
+        await response.prepare(request)
+        if step == "drop":
+            request.transport.close()
+            return response
+        await response.write(step)
+        if step.endswith(b"DROP"):
+            request.transport.close()
+            return response
+        return response
+
+    return handler, calls
+
+
+def generate(handler, client=None, max_attempts=5):
+    client = client or base.ModelClient("A", "model_a")
+    chunks = []
+
+    async def main():
+        async with stub_server(handler) as url:
+            async with base.aiohttp.ClientSession() as session:
+                async for chunk in client.stream_response(session, "hi", url,
+                                                          max_attempts=max_attempts):
+                    chunks.append(chunk)
+
+    asyncio.run(main())
+    return chunks
+
+
+def test_transient_statuses_are_retried_until_success():
+    handler, calls = scripted(503, 429, 500, sse(delta("hel"), delta("lo")))
+    assert generate(handler) == ["hel", "lo"]
+    assert calls[:3] == [503, 429, 500]
+
+
+def test_client_error_status_is_not_retried():
+    handler, calls = scripted(400, sse(delta("unreachable")))
+    with pytest.raises(base.LLMError) as excinfo:
+        generate(handler)
+    assert excinfo.value.status == 400
+    assert len(calls) == 1
+
+
+def test_retries_stop_after_max_attempts():
+    handler, calls = scripted(500)
+    with pytest.raises(base.LLMError) as excinfo:
+        generate(handler, max_attempts=3)
+    assert excinfo.value.status == 500
+    assert len(calls) == 3
+
+
+def test_dropped_connection_before_first_token_is_retried():
+    handler, calls = scripted("drop", sse(delta("ok")))
+    assert generate(handler) == ["ok"]
+    assert len(calls) == 2
+
+
+def test_failure_after_first_token_is_not_retried():
+    partial = b"data: " + orjson.dumps(delta("half")) + b"\n\nDROP"
+    handler, calls = scripted(partial, sse(delta("again")))
+    client = base.ModelClient("A", "model_a")
+    chunks = []
+
+    async def main():
+        async with stub_server(handler) as url:
+            async with base.aiohttp.ClientSession() as session:
+                async for chunk in client.stream_response(session, "hi", url):
+                    chunks.append(chunk)
+
+    with pytest.raises(base.LLMError) as excinfo:
+        asyncio.run(main())
+    assert excinfo.value.status is None
+    assert chunks == ["half"]
+    assert len(calls) == 1
+    assert len(client.conversation_history) == 0
+
+
+def test_error_event_raises_statusless_llm_error():
+    handler, calls = scripted(sse({"error": {"message": "model crashed"}}))
+    with pytest.raises(base.LLMError) as excinfo:
+        generate(handler)
+    assert excinfo.value.status is None
+    assert "model crashed" in str(excinfo.value)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("data, expected", [
+    (orjson.dumps(delta("hi")), "hi"),
+    (b'{"choices":[]}', None),
+    (b'{"choices":[{"delta":null}]}', None),
+    (b'{"choices":[{"delta":{"role":"assistant"}}]}', None),
+])
+def test_parse_delta_accepts_events_without_content(data, expected):
+    assert base.ModelClient._parse_delta(data) == expected
+
+
+@pytest.mark.parametrize("data", [
+    b'{"error":"overloaded"}',
+    b'{"choices":[{"delta":',
+    b'[]',
+    b'{"choices":[null]}',
+])
+def test_parse_delta_rejects_malformed_events(data):
+    with pytest.raises(base.LLMError) as excinfo:
+        base.ModelClient._parse_delta(data)
+    assert excinfo.value.status is None